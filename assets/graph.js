@@ -0,0 +1,122 @@
+// Selection change waiting for the debounce delay to pass
+const pendingSelection = {timer: null, resolve: null};
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    graph: {
+        /**
+         * Forward the selector value once it has been unchanged for 200ms, so
+         * quick successive selections reach the server as a single update.
+         */
+        debounce: function(value) {
+            if (pendingSelection.timer !== null) {
+                clearTimeout(pendingSelection.timer);
+                pendingSelection.resolve(window.dash_clientside.no_update);
+            }
+            return new Promise((resolve) => {
+                pendingSelection.resolve = resolve;
+                pendingSelection.timer = setTimeout(() => {
+                    pendingSelection.timer = null;
+                    resolve(value);
+                }, 200);
+            });
+        },
+
+        /**
+         * Fetch the graph elements served by the server, together
+         * with the per-file subgraphs of level-of-detail mode.
+         */
+        load: function(url) {
+            return fetch(url)
+                .then((response) => response.json())
+                .then((graph) => [graph.nodes.concat(graph.edges), graph.subgraphs || null]);
+        },
+
+        /**
+         * Add the elements of the tapped file and of the files with visible
+         * code elements that are not loaded yet. New nodes without a position are
+         * placed on a circle around their file node.
+         */
+        expand: function(tapped, visible, elements, subgraphs) {
+            if (!subgraphs || !elements) {
+                return window.dash_clientside.no_update;
+            }
+
+            const files = new Set();
+            if (tapped && tapped.type === 'file') {
+                files.add(tapped.id);
+            }
+            if (visible) {
+                // Only files owning visible code elements are loaded; a visible
+                // file node alone (e.g. under a selected folder) shows no contents
+                for (const id of Object.keys(visible.nodes)) {
+                    if (!id.startsWith('file:') && !id.startsWith('folder:')) {
+                        // Code element ids are '<file path>:<name>'
+                        files.add('file:' + id.slice(0, id.lastIndexOf(':')));
+                    }
+                }
+            }
+
+            const present = new Map();
+            for (const element of elements) {
+                if (element.data.source === undefined) {
+                    present.set(element.data.id, element);
+                }
+            }
+            const added = [];
+            for (const fileId of files) {
+                const subgraph = subgraphs[fileId];
+                if (!subgraph || present.has(subgraph[0].data.id)) {
+                    continue;
+                }
+                const center = (present.get(fileId) || {}).position || {x: 0, y: 0};
+                const count = subgraph.filter((element) => element.data.source === undefined).length;
+                const radius = 40 + 8 * count;
+                let i = 0;
+                for (const element of subgraph) {
+                    if (element.data.source !== undefined || element.position) {
+                        added.push(element);
+                        continue;
+                    }
+                    const angle = 2 * Math.PI * i++ / count;
+                    added.push(Object.assign({}, element, {
+                        position: {x: center.x + radius * Math.cos(angle), y: center.y + radius * Math.sin(angle)}
+                    }));
+                }
+            }
+            return added.length ? elements.concat(added) : window.dash_clientside.no_update;
+        },
+
+        /**
+         * Build the stylesheet that shows only the visible nodes computed by the
+         * server, the keys of visible.nodes; null shows the whole graph. Edges
+         * are hidden together with their endpoints.
+         */
+        stylesheet: function(visible, parts) {
+            if (!visible) {
+                return parts.base;
+            }
+
+            // Selector strings are matched verbatim, without unescaping
+            const quote = (value) => value.includes('"') ? "'" + value + "'" : '"' + value + '"';
+            const rules = parts.base.concat([{selector: 'node', style: {display: 'none'}}]);
+            const ids = Object.keys(visible.nodes);
+            if (ids.length) {
+                rules.push({
+                    selector: ids.map((id) => 'node[id = ' + quote(id) + ']').join(', '),
+                    style: {display: 'element'}
+                });
+            }
+
+            // Highlight call and usage edges leaving the selected file
+            if (visible.file !== null) {
+                const prefix = quote(visible.file + ':');
+                rules.push({
+                    selector: 'edge[type != "contains"][source ^= ' + prefix + '][target !^= ' + prefix + '], '
+                        + 'edge[type != "contains"][target ^= ' + prefix + '][source !^= ' + prefix + ']',
+                    style: parts.cross_file
+                });
+            }
+            return rules;
+        }
+    }
+});
@@ -1,5 +1,7 @@
-from typing import Dict, List, Set, Optional
-from metadata import FunctionMetadata
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Set, Optional, Tuple
+from metadata import EMPTY_IDS, FunctionMetadata, Relationships
 
 class GraphFilter:
     """Handles filtering of nodes and relationships in the code graph."""
@@ -15,45 +17,158 @@ class GraphFilter:
             '.c': '#555555',     # C gray
         }
         self.folder_color = '#4CAF50'  # Green
+        # Indices over the last node dict seen, rebuilt when a different dict is passed in
+        self._indexed_nodes: Optional[Dict] = None
+        self._by_type: Dict[str, Dict] = {}
+        # Parallel (ids, lowercased ids, lowercased labels) columns for name matching
+        self._name_index: Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]] = ((), (), ())
+        self._name_index_by_type: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]] = {}
+        # Neighbourhood caches for the last relationships seen. N(A | B) = N(A) | N(B),
+        # so selections are unions of cached per-node neighbourhoods.
+        self._relationships: Optional[Relationships] = None
+        self._relationships_version = 0
+        self._node_neighborhoods: Dict[Tuple[str, str], FrozenSet[str]] = {}
+        self._neighborhood = lru_cache(maxsize=256)(self._compute_neighborhood)
+        
+    @staticmethod
+    def _build_name_index(nodes: Dict) -> Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]:
+        """Precompute lowercased ids and labels as parallel tuples."""
+        ids = tuple(nodes)
+        keys_lower = tuple(k.lower() for k in ids)
+        labels_lower = tuple(v.get('label', '').lower() for v in nodes.values())
+        return ids, keys_lower, labels_lower
+        
+    def index(self, nodes: Dict):
+        """Build per-type node buckets once for the given node dict."""
+        if nodes is self._indexed_nodes:
+            return
+            
+        by_type = {node_type: {} for node_type in self.node_types}
+        for k, v in nodes.items():
+            bucket = by_type.get(v.get('type'))
+            if bucket is not None:
+                bucket[k] = v
+                
+        self._by_type = by_type
+        self._name_index = self._build_name_index(nodes)
+        self._name_index_by_type = {
+            node_type: self._build_name_index(bucket) for node_type, bucket in by_type.items()
+        }
+        self._indexed_nodes = nodes
+        
+    def invalidate(self):
+        """Drop the indices and caches, e.g. after the graph was mutated in place."""
+        self._indexed_nodes = None
+        self._relationships = None
+        
+    def _bind_relationships(self, relationships: Relationships):
+        """Reset the neighbourhood caches when a different relationships object is passed in."""
+        if relationships is self._relationships:
+            return
+            
+        self._relationships = relationships
+        self._relationships_version += 1
+        self._node_neighborhoods.clear()
+        self._neighborhood.cache_clear()
+        
+    def _node_neighborhood(self, node_id: str, direction: str) -> FrozenSet[str]:
+        """Get the direct callees and/or callers of a single node."""
+        key = (node_id, direction)
+        neighborhood = self._node_neighborhoods.get(key)
+        if neighborhood is None:
+            neighbors = set()
+            if direction in ('both', 'out'):
+                neighbors.update(self._relationships.calls.get(node_id, EMPTY_IDS))
+            if direction in ('both', 'in'):
+                neighbors.update(self._relationships.called_by.get(node_id, EMPTY_IDS))
+            neighborhood = self._node_neighborhoods[key] = frozenset(neighbors)
+        return neighborhood
+        
+    def _compute_neighborhood(self, version: int, selected: FrozenSet[str], direction: str) -> FrozenSet[str]:
+        """Get the selected nodes plus their neighbourhoods; memoized per relationships version."""
+        keep_nodes = set(selected)
+        for node_id in selected:
+            keep_nodes.update(self._node_neighborhood(node_id, direction))
+        return frozenset(keep_nodes)
+        
+    def _name_columns(self, nodes: Dict) -> Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]:
+        """Get the name matching columns for a node dict, reusing the index where possible."""
+        if nodes is self._indexed_nodes:
+            return self._name_index
+            
+        # Reuse the per-type columns when chained after filter_by_type
+        for node_type, bucket in self._by_type.items():
+            if nodes is bucket:
+                return self._name_index_by_type[node_type]
+        return self._build_name_index(nodes)
         
     def filter_by_type(self, nodes: Dict, node_type: str) -> Dict:
-        """Filter nodes by type (folder, file, or function)."""
+        """Filter nodes by type (folder, file, or function).
+        
+        The returned dict is a shared bucket of the index and must not be mutated.
+        """
         if node_type not in self.node_types:
             return nodes
             
-        return {
-            k: v for k, v in nodes.items()
-            if (node_type == 'folder' and v.get('type') == 'folder') or
-               (node_type == 'file' and v.get('type') == 'file') or
-               (node_type == 'function' and v.get('type') == 'function')
-        }
+        self.index(nodes)
+        return self._by_type[node_type]
         
     def filter_by_name(self, nodes: Dict, name_pattern: str) -> Dict:
         """Filter nodes by name pattern."""
         if not name_pattern:
             return nodes
             
+        ids, keys_lower, labels_lower = self._name_columns(nodes)
         pattern = name_pattern.lower()
         return {
-            k: v for k, v in nodes.items()
-            if pattern in k.lower() or pattern in v.get('label', '').lower()
+            i: nodes[i] for i, kl, ll in zip(ids, keys_lower, labels_lower)
+            if pattern in kl or pattern in ll
+        }
+        
+    def filter_by_regex(self, nodes: Dict, pattern: str) -> Dict:
+        """Filter nodes whose id or label matches a case-insensitive regular expression.
+        
+        Raises re.error for invalid patterns.
+        """
+        if not pattern:
+            return nodes
+            
+        search = re.compile(pattern, re.IGNORECASE).search
+        ids, keys_lower, labels_lower = self._name_columns(nodes)
+        return {
+            i: nodes[i] for i, kl, ll in zip(ids, keys_lower, labels_lower)
+            if search(kl) or search(ll)
         }
         
-    def filter_by_relationships(self, nodes: Dict, relationships: Dict,
+    def filter_by_terms(self, nodes: Dict, terms: List[str], match_all: bool = False) -> Dict:
+        """Filter nodes whose id or label contains any (or all) of several substrings."""
+        terms = [term.lower() for term in terms if term]
+        if not terms:
+            return nodes
+            
+        ids, keys_lower, labels_lower = self._name_columns(nodes)
+        if match_all:
+            return {
+                i: nodes[i] for i, kl, ll in zip(ids, keys_lower, labels_lower)
+                if all(term in kl or term in ll for term in terms)
+            }
+            
+        # One alternation scans each string once instead of once per term
+        search = re.compile('|'.join(map(re.escape, terms))).search
+        return {
+            i: nodes[i] for i, kl, ll in zip(ids, keys_lower, labels_lower)
+            if search(kl) or search(ll)
+        }
+        
+    def filter_by_relationships(self, nodes: Dict, relationships: Relationships,
                               selected_nodes: List[str], direction: str = 'both') -> Dict:
         """Filter nodes based on their relationships to selected nodes."""
         if not selected_nodes:
             return nodes
             
-        keep_nodes = set(selected_nodes)
-        
-        for node_id in selected_nodes:
-            if node_id in relationships:
-                if direction in ('both', 'out'):
-                    keep_nodes.update(relationships[node_id]['calls'])
-                if direction in ('both', 'in'):
-                    keep_nodes.update(relationships[node_id]['called_by'])
-                    
+        self._bind_relationships(relationships)
+        keep_nodes = self._neighborhood(self._relationships_version, frozenset(selected_nodes), direction)
+        
         return {k: v for k, v in nodes.items() if k in keep_nodes}
         
     def get_node_color(self, node_type: str, file_extension: Optional[str] = None) -> str:
@@ -65,13 +180,23 @@ class GraphFilter:
         else:
             return '#2196F3'  # Function blue
             
-    def apply_filters(self, nodes: Dict, relationships: Dict,
+    def apply_filters(self, nodes: Dict, relationships: Relationships,
                      node_type: Optional[str] = None,
                      name_pattern: Optional[str] = None,
                      selected_nodes: Optional[List[str]] = None,
                      relationship_direction: str = 'both') -> Dict:
-        """Apply all filters in sequence."""
-        filtered_nodes = nodes.copy()
+        """Apply all filters in sequence.
+        
+        Filters never copy or mutate their input, so the result may be `nodes`
+        itself or a shared index bucket and must be treated as read-only.
+        """
+        if not (node_type or name_pattern or selected_nodes):
+            return nodes
+            
+        # Only the type and name filters read the node indices
+        if node_type or name_pattern:
+            self.index(nodes)
+        filtered_nodes = nodes
         
         if node_type:
             filtered_nodes = self.filter_by_type(filtered_nodes, node_type)
@@ -1,11 +1,27 @@
 import argparse
+import gzip
+import hashlib
 import os
-import json
+import pickle
 from pathlib import Path
+import orjson
 from scraper import RepositoryScraper
 from visualizer import GraphVisualizer
 from metadata import FunctionMetadata, ClassMetadata
 
+CACHE_FILENAMES = {
+    'pickle': ".code_graph_cache.pkl.gz",
+    'json': ".code_graph_cache.json"
+}
+# Unpickling runs code, so pickle caches live in the user's cache directory,
+# never inside the (possibly untrusted) repository being analyzed
+USER_CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / "graph-code-viewer"
+CACHE_MAGIC = b"GCVC"
+# Bump whenever the cached metadata layout changes so stale caches are ignored
+CACHE_VERSION = 6
+# Node positions of the graph, reused while the graph is unchanged
+LAYOUT_CACHE_FILENAME = ".code_graph_layout.npz"
+
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(
@@ -23,6 +39,12 @@ def parse_args():
         default=True,
         help="Enable caching of analysis results"
     )
+    parser.add_argument(
+        "--cache-format",
+        choices=sorted(CACHE_FILENAMES),
+        default="pickle",
+        help="Format of the cache file; json is slower but readable by other tools"
+    )
     parser.add_argument(
         "--workers",
         type=int,
@@ -37,135 +59,85 @@ def parse_args():
     )
     return parser.parse_args()
 
-def load_cache(repo_path: str) -> tuple:
-    """Load cached analysis results if they exist."""
-    cache_file = Path(repo_path) / ".code_graph_cache.json"
+def function_from_dict(data: dict) -> FunctionMetadata:
+    """Rebuild a FunctionMetadata object from its JSON form."""
+    return FunctionMetadata(**{k: v for k, v in data.items() if k != 'id'})
+
+def class_from_dict(data: dict) -> ClassMetadata:
+    """Rebuild a ClassMetadata object from its JSON form."""
+    fields = {k: v for k, v in data.items() if k != 'id'}
+    fields['methods'] = [function_from_dict(m) for m in data['methods']]
+    return ClassMetadata(**fields)
+
+def get_cache_file(repo_path: str, cache_format: str = 'pickle') -> Path:
+    """Get the cache file of a repository.
+    
+    JSON caches are kept in the repository; pickle caches in the user cache
+    directory, named by a hash of the repository path.
+    """
+    if cache_format == 'json':
+        return Path(repo_path) / CACHE_FILENAMES['json']
+    repo_hash = hashlib.blake2b(os.fsencode(repo_path), digest_size=16).hexdigest()
+    return USER_CACHE_DIR / f"{repo_hash}{CACHE_FILENAMES['pickle']}"
+
+def load_cache(repo_path: str, cache_format: str = 'pickle') -> tuple:
+    """Load cached per-file analysis results if they exist."""
+    cache_file = get_cache_file(repo_path, cache_format)
     try:
         if cache_file.exists() and cache_file.stat().st_size > 0:
-            with open(cache_file, 'r') as f:
-                cache = json.load(f)
-                
-            # Convert function dictionaries back to FunctionMetadata objects
-            functions = [
-                FunctionMetadata(
-                    name=f['name'],
-                    folder_path=f['folder_path'],
-                    file_path=f['file_path'],
-                    script_type=f['script_type'],
-                    docstring=f['docstring'],
-                    parameters=f['parameters'],
-                    returns=f['returns'],
-                    line_number=f['line_number'],
-                    called_functions=f['called_functions'],
-                    used_classes=f['used_classes']
-                )
-                for f in cache['functions']
-            ]
-            
-            # Convert class dictionaries back to ClassMetadata objects
-            classes = [
-                ClassMetadata(
-                    name=c['name'],
-                    folder_path=c['folder_path'],
-                    file_path=c['file_path'],
-                    script_type=c['script_type'],
-                    docstring=c['docstring'],
-                    methods=[
-                        FunctionMetadata(
-                            name=m['name'],
-                            folder_path=m['folder_path'],
-                            file_path=m['file_path'],
-                            script_type=m['script_type'],
-                            docstring=m['docstring'],
-                            parameters=m['parameters'],
-                            returns=m['returns'],
-                            line_number=m['line_number'],
-                            called_functions=m['called_functions'],
-                            used_classes=m['used_classes']
-                        )
-                        for m in c['methods']
-                    ]
-                )
-                for c in cache['classes']
-            ]
-            
-            # Convert relationship lists back to sets
-            relationships = {}
-            for func_id, rel_dict in cache['relationships'].items():
-                relationships[func_id] = {
-                    rel_type: set(rel_list) for rel_type, rel_list in rel_dict.items()
+            if cache_format == 'json':
+                with open(cache_file, 'rb') as f:
+                    cache = orjson.loads(f.read())
+                if cache.get('version') != CACHE_VERSION:
+                    print("Cache format is outdated, ignoring it")
+                    return None, None
+                    
+                per_file = {
+                    file_path: (
+                        [function_from_dict(func) for func in functions],
+                        [class_from_dict(cls) for cls in classes]
+                    )
+                    for file_path, (functions, classes) in cache['per_file'].items()
                 }
-            
-            return functions, classes, cache['file_info'], relationships
-    except (json.JSONDecodeError, KeyError, FileNotFoundError) as e:
+                return cache['file_hashes'], per_file
+                
+            with open(cache_file, 'rb') as f:
+                header = f.read(len(CACHE_MAGIC) + 1)
+                if header != CACHE_MAGIC + bytes([CACHE_VERSION]):
+                    print("Cache format is outdated, ignoring it")
+                    return None, None
+                    
+                # Metadata dataclasses are stored natively
+                with gzip.GzipFile(fileobj=f, mode='rb') as gz:
+                    cache = pickle.load(gz)
+                    
+            return cache['file_hashes'], cache['per_file']
+    except Exception as e:
+        # The cache can always be rebuilt, so any unreadable cache (corrupt
+        # gzip data, renamed metadata classes, ...) just triggers a full scan
         print(f"Cache loading failed: {str(e)}")
-    return None, None, None, None
+    return None, None
 
-def save_cache(repo_path: str, functions: list, classes: list, file_info: dict, relationships: dict):
-    """Save analysis results to cache."""
-    cache_file = Path(repo_path) / ".code_graph_cache.json"
-    
-    # Convert FunctionMetadata objects to dictionaries
-    functions_dict = [
-        {
-            'name': f.name,
-            'folder_path': f.folder_path,
-            'file_path': f.file_path,
-            'script_type': f.script_type,
-            'docstring': f.docstring,
-            'parameters': f.parameters,
-            'returns': f.returns,
-            'line_number': f.line_number,
-            'called_functions': f.called_functions,
-            'used_classes': f.used_classes
-        }
-        for f in functions
-    ]
-    
-    # Convert ClassMetadata objects to dictionaries
-    classes_dict = [
-        {
-            'name': c.name,
-            'folder_path': c.folder_path,
-            'file_path': c.file_path,
-            'script_type': c.script_type,
-            'docstring': c.docstring,
-            'methods': [
-                {
-                    'name': m.name,
-                    'folder_path': m.folder_path,
-                    'file_path': m.file_path,
-                    'script_type': m.script_type,
-                    'docstring': m.docstring,
-                    'parameters': m.parameters,
-                    'returns': m.returns,
-                    'line_number': m.line_number,
-                    'called_functions': m.called_functions,
-                    'used_classes': m.used_classes
-                }
-                for m in c.methods
-            ]
-        }
-        for c in classes
-    ]
-    
-    # Convert sets to lists in relationships
-    serializable_relationships = {}
-    for func_id, rel_dict in relationships.items():
-        serializable_relationships[func_id] = {
-            rel_type: list(rel_set) for rel_type, rel_set in rel_dict.items()
-        }
-    
+def save_cache(repo_path: str, file_hashes: dict, per_file: dict, cache_format: str = 'pickle'):
+    """Save per-file analysis results to cache."""
+    cache_file = get_cache_file(repo_path, cache_format)
     cache = {
-        'functions': functions_dict,
-        'classes': classes_dict,
-        'file_info': file_info,
-        'relationships': serializable_relationships
+        'file_hashes': file_hashes,
+        'per_file': per_file
     }
     
     try:
-        with open(cache_file, 'w') as f:
-            json.dump(cache, f, indent=2)
+        if cache_format == 'json':
+            # orjson serializes the metadata dataclasses natively and without indentation
+            cache['version'] = CACHE_VERSION
+            with open(cache_file, 'wb') as f:
+                f.write(orjson.dumps(cache, option=orjson.OPT_NON_STR_KEYS))
+        else:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(cache_file, 'wb') as f:
+                f.write(CACHE_MAGIC + bytes([CACHE_VERSION]))
+                with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=1) as gz:
+                    pickle.dump(cache, gz, protocol=5)
         print(f"Cache saved successfully to {cache_file}")
     except Exception as e:
         print(f"Failed to save cache: {str(e)}")
@@ -180,27 +152,26 @@ def main():
         print(f"Error: Repository path '{repo_path}' does not exist")
         return 1
         
-    # Try to load from cache first
-    functions = classes = file_info = relationships = None
+    # Try to load per-file results from cache first
+    file_hashes = per_file = None
     if args.cache:
         print("Attempting to load from cache...")
-        functions, classes, file_info, relationships = load_cache(repo_path)
-        
-    # If cache loading failed or cache is disabled, analyze repository
-    if not all((functions, classes, file_info, relationships)):
-        print("Analyzing repository...")
-        scraper = RepositoryScraper(repo_path, workers=args.workers)
-        functions, classes, file_info, relationships = scraper.scan_repository()
+        file_hashes, per_file = load_cache(repo_path, args.cache_format)
         
-        if args.cache:
-            print("Saving results to cache...")
-            save_cache(repo_path, functions, classes, file_info, relationships)
-    else:
-        print("Successfully loaded from cache")
+    # Only files that changed since the cache was written are parsed again
+    print("Analyzing repository...")
+    scraper = RepositoryScraper(repo_path, workers=args.workers,
+                                file_hashes=file_hashes, per_file=per_file)
+    functions, classes, file_info, relationships = scraper.scan_repository()
+    
+    if args.cache:
+        print("Saving results to cache...")
+        save_cache(repo_path, scraper.file_hashes, scraper.per_file, args.cache_format)
         
     # Create and run the visualization
     print(f"Starting visualization server on port {args.port}...")
-    visualizer = GraphVisualizer(functions, classes, file_info, relationships)
+    layout_cache = str(Path(repo_path) / LAYOUT_CACHE_FILENAME) if args.cache else None
+    visualizer = GraphVisualizer(functions, classes, file_info, relationships, layout_cache=layout_cache)
     visualizer.run_server(port=args.port)
     
 if __name__ == "__main__":
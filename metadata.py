@@ -1,9 +1,27 @@
 import ast
 import os
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass
+import sys
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple, Any
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
 
-@dataclass
+FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+# Shared result for nodes without relationships of a given kind
+EMPTY_IDS: FrozenSet[str] = frozenset()
+
+def _setstate_interning_id(self, state):
+    """Restore a pickled metadata object (worker results, the cache), re-interning its id.
+    
+    Unpickling skips __post_init__, so without this ids would arrive as
+    fresh, non-interned strings.
+    """
+    _, slots = state
+    for name, value in slots.items():
+        setattr(self, name, value)
+    self.id = sys.intern(self.id)
+
+@dataclass(slots=True)
 class FunctionMetadata:
     """Class for storing function metadata."""
     name: str
@@ -16,8 +34,15 @@ class FunctionMetadata:
     line_number: int
     called_functions: List[str]
     used_classes: List[str]
+    id: str = field(init=False)
+    
+    def __post_init__(self):
+        # Interned so relationship dict lookups mostly compare by identity
+        self.id = sys.intern(f"{self.file_path}:{self.name}")
+        
+    __setstate__ = _setstate_interning_id
 
-@dataclass
+@dataclass(slots=True)
 class ClassMetadata:
     """Class for storing class metadata."""
     name: str
@@ -26,6 +51,70 @@ class ClassMetadata:
     script_type: str
     docstring: Optional[str]
     methods: List[FunctionMetadata]
+    id: str = field(init=False)
+    
+    def __post_init__(self):
+        self.id = sys.intern(f"{self.file_path}:{self.name}")
+        
+    __setstate__ = _setstate_interning_id
+
+@dataclass
+class Relationships:
+    """Class for storing relationships between code elements, one id -> ids map per kind.
+    
+    Maps only hold nodes that have at least one relationship of that kind;
+    read them with .get(node_id, EMPTY_IDS).
+    """
+    contains: Dict[str, Set[str]] = field(default_factory=lambda: defaultdict(set))
+    calls: Dict[str, Set[str]] = field(default_factory=lambda: defaultdict(set))
+    called_by: Dict[str, Set[str]] = field(default_factory=lambda: defaultdict(set))
+    uses: Dict[str, Set[str]] = field(default_factory=lambda: defaultdict(set))
+    used_by: Dict[str, Set[str]] = field(default_factory=lambda: defaultdict(set))
+    
+    def __setstate__(self, state):
+        """Restore relationships pickled by a worker process, re-interning their ids."""
+        for kind, mapping in state.items():
+            interned = defaultdict(set)
+            for node_id, targets in mapping.items():
+                interned[sys.intern(node_id)] = {sys.intern(target) for target in targets}
+            setattr(self, kind, interned)
+            
+    def update(self, other: 'Relationships'):
+        """Merge relationships of nodes that are not present in this instance yet."""
+        self.contains.update(other.contains)
+        self.calls.update(other.calls)
+        self.called_by.update(other.called_by)
+        self.uses.update(other.uses)
+        self.used_by.update(other.used_by)
+
+class _FuncBodyVisitor(ast.NodeVisitor):
+    """Collects called names and class usages of a function body in a single traversal."""
+    
+    def __init__(self):
+        self.reset()
+        
+    def reset(self, known_classes: Optional[FrozenSet[str]] = None):
+        """Prepare the visitor for another function; the previous results are left untouched."""
+        # Names that can refer to a class in this module; None accepts any capitalised name
+        self.known_classes = known_classes
+        self.calls: List[str] = []
+        self.uses: Set[str] = set()
+        
+    def visit_Call(self, node: ast.Call):
+        if isinstance(node.func, ast.Name):
+            self.calls.append(node.func.id)
+        elif isinstance(node.func, ast.Attribute):
+            self.calls.append(node.func.attr)
+        # The callee Name (e.g. x = ClassName()) is picked up by visit_Name
+        self.generic_visit(node)
+        
+    def visit_Name(self, node: ast.Name):
+        if self.known_classes is not None:
+            if node.id in self.known_classes:
+                self.uses.add(node.id)
+        # Python naming convention: class names typically start with uppercase
+        elif node.id[0].isupper():
+            self.uses.add(node.id)
 
 class MetadataExtractor:
     """Extracts metadata from Python source files."""
@@ -33,6 +122,10 @@ class MetadataExtractor:
     def __init__(self):
         self.current_file = ""
         self.current_folder = ""
+        self.current_script_type = ""
+        self.current_known_classes: Optional[FrozenSet[str]] = None
+        # Reused for every function instead of instantiating a visitor each time
+        self._visitor = _FuncBodyVisitor()
         
     def extract_type_hint(self, annotation: Optional[ast.AST]) -> str:
         """Extract type hint from AST annotation."""
@@ -54,42 +147,12 @@ class MetadataExtractor:
         else:
             return "Any"
 
-    def extract_function_calls(self, node: ast.FunctionDef) -> List[str]:
-        """Extract function calls from a function definition."""
-        calls = []
-        
-        class FunctionCallVisitor(ast.NodeVisitor):
-            def visit_Call(self, node):
-                if isinstance(node.func, ast.Name):
-                    calls.append(node.func.id)
-                elif isinstance(node.func, ast.Attribute):
-                    calls.append(node.func.attr)
-                self.generic_visit(node)
-                
-        FunctionCallVisitor().visit(node)
-        return calls
-
-    def extract_class_usages(self, node: ast.FunctionDef) -> List[str]:
-        """Extract class usages from a function definition."""
-        class_usages = []
-        
-        class ClassUsageVisitor(ast.NodeVisitor):
-            def visit_Call(self, node):
-                # Check for class instantiation patterns, e.g., x = ClassName()
-                if isinstance(node.func, ast.Name):
-                    # Python naming convention: class names typically start with uppercase
-                    if node.func.id and node.func.id[0].isupper():
-                        class_usages.append(node.func.id)
-                self.generic_visit(node)
-                
-            def visit_Name(self, node):
-                # Check for direct class references
-                if isinstance(node, ast.Name) and node.id and node.id[0].isupper():
-                    class_usages.append(node.id)
-                self.generic_visit(node)
-                
-        ClassUsageVisitor().visit(node)
-        return list(set(class_usages))  # Remove duplicates
+    def extract_body_references(self, node: ast.FunctionDef) -> Tuple[List[str], List[str]]:
+        """Extract function calls and class usages from a function definition in one pass."""
+        visitor = self._visitor
+        visitor.reset(self.current_known_classes)
+        visitor.visit(node)
+        return visitor.calls, list(visitor.uses)
 
     def extract_function_metadata(self, node: ast.FunctionDef) -> FunctionMetadata:
         """Extract metadata from a function definition."""
@@ -108,17 +171,14 @@ class MetadataExtractor:
         # Extract return type
         returns = self.extract_type_hint(node.returns)
         
-        # Extract function calls
-        called_functions = self.extract_function_calls(node)
-        
-        # Extract class usages
-        used_classes = self.extract_class_usages(node)
+        # Extract function calls and class usages
+        called_functions, used_classes = self.extract_body_references(node)
         
         return FunctionMetadata(
             name=node.name,
             folder_path=self.current_folder,
             file_path=self.current_file,
-            script_type=os.path.splitext(self.current_file)[1],
+            script_type=self.current_script_type,
             docstring=docstring,
             parameters=parameters,
             returns=returns,
@@ -130,13 +190,13 @@ class MetadataExtractor:
     def extract_class_metadata(self, node: ast.ClassDef) -> ClassMetadata:
         """Extract metadata from a class definition."""
         docstring = ast.get_docstring(node) or ""
-        methods = [self.extract_function_metadata(n) for n in node.body if isinstance(n, ast.FunctionDef)]
+        methods = [self.extract_function_metadata(n) for n in node.body if isinstance(n, FUNCTION_NODES)]
         
         return ClassMetadata(
             name=node.name,
             folder_path=self.current_folder,
             file_path=self.current_file,
-            script_type=os.path.splitext(self.current_file)[1],
+            script_type=self.current_script_type,
             docstring=docstring,
             methods=methods
         )
@@ -145,19 +205,61 @@ class MetadataExtractor:
         """Process a Python file and extract metadata from all functions and classes."""
         self.current_file = file_path
         self.current_folder = os.path.dirname(file_path)
+        self.current_script_type = os.path.splitext(file_path)[1]
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            try:
-                tree = ast.parse(f.read())
-            except SyntaxError:
-                return [], []
+        # ast.parse decodes bytes itself (honouring coding cookies), so skip
+        # the text-mode decode and newline translation
+        with open(file_path, 'rb') as f:
+            source = f.read()
+        try:
+            tree = ast.parse(source, filename=file_path)
+        except SyntaxError:
+            return [], []
                 
+        # First pass, breadth-first over statements only: collect definitions and
+        # the class names defined, imported or aliased at module level. Methods are
+        # extracted together with their class, so direct children of a class body
+        # are skipped.
+        definitions = []
+        known_classes = set()
+        star_import = False
+        pending = deque([(tree, False, True)])
+        while pending:
+            parent, in_class_body, module_level = pending.popleft()
+            for node in ast.iter_child_nodes(parent):
+                if isinstance(node, FUNCTION_NODES):
+                    if not in_class_body:
+                        definitions.append(node)
+                    pending.append((node, False, False))
+                elif isinstance(node, ast.ClassDef):
+                    definitions.append(node)
+                    known_classes.add(node.name)
+                    pending.append((node, True, False))
+                elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                    for alias in node.names:
+                        if alias.name == '*':
+                            star_import = True
+                        name = alias.asname or alias.name.split('.')[0]
+                        if name[0].isupper():
+                            known_classes.add(name)
+                elif isinstance(node, (ast.stmt, ast.excepthandler)):
+                    # Module-level aliases such as `Charset = _charset.Charset`
+                    if module_level and isinstance(node, ast.Assign):
+                        for target in node.targets:
+                            if isinstance(target, ast.Name) and target.id[0].isupper():
+                                known_classes.add(target.id)
+                    pending.append((node, False, module_level))
+                    
+        # A star import can bring in any class name, so fall back to the naming convention
+        self.current_known_classes = None if star_import else frozenset(known_classes)
+        
+        # Second pass: extract metadata, recording only usages of known class names
         functions = []
         classes = []
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                functions.append(self.extract_function_metadata(node))
-            elif isinstance(node, ast.ClassDef):
+        for node in definitions:
+            if isinstance(node, ast.ClassDef):
                 classes.append(self.extract_class_metadata(node))
+            else:
+                functions.append(self.extract_function_metadata(node))
                 
         return functions, classes 
\ No newline at end of file
@@ -1,157 +1,220 @@
 import os
-from typing import Dict, List, Set, Tuple
+import sys
+import hashlib
+from typing import Dict, List, Optional, Set, Tuple
 from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 import git
-from joblib import Parallel, delayed
 from tqdm import tqdm
-from metadata import MetadataExtractor, FunctionMetadata, ClassMetadata
+from metadata import MetadataExtractor, FunctionMetadata, ClassMetadata, Relationships
+
+# Virtual environments, VCS metadata and build directories
+SKIP_DIRS = frozenset({'venv', '.git', 'node_modules', '__pycache__', 'build', 'dist'})
+
+# Below this many functions and classes, shipping metadata to worker
+# processes costs more than resolving relationships serially
+PARALLEL_RELATIONSHIP_THRESHOLD = 20000
+
+def _build_partial_relationships(classes: List[ClassMetadata],
+                                 functions: List[FunctionMetadata]) -> Tuple[Relationships, List[Tuple[str, str]]]:
+    """Extract the same-file relationships of a group of files.
+    
+    Returns the relationships together with the (user id, class name) pairs
+    whose class is not defined in the user's file, for cross-file resolution.
+    """
+    # Relationship sets are only allocated once an edge is added to them
+    relationships = Relationships()
+    unresolved = []
+    
+    # Map each file to the ids of the names defined in it, so same-file
+    # targets resolve with two dict lookups instead of building an id
+    by_file_name = defaultdict(dict)
+    
+    # Process classes
+    for cls in classes:
+        cls_id = cls.id
+        by_file_name[cls.file_path][cls.name] = cls_id
+        
+        for method in cls.methods:
+            method_id = method.id
+            relationships.contains[cls_id].add(method_id)
+            by_file_name[method.file_path][method.name] = method_id
+            
+    # Register standalone functions
+    for func in functions:
+        by_file_name[func.file_path][func.name] = func.id
+        
+    # Process calls and class usages of functions and methods alike
+    methods = (method for cls in classes for method in cls.methods)
+    for func in chain(functions, methods):
+        func_id = func.id
+        file_names = by_file_name[func.file_path]
+        
+        # Handle function calls
+        for called_name in func.called_functions:
+            target_id = file_names.get(called_name)
+            if target_id:
+                relationships.calls[func_id].add(target_id)
+                relationships.called_by[target_id].add(func_id)
+                
+        # Handle class usages, checking the same file first
+        for used_class in func.used_classes:
+            target_id = file_names.get(used_class)
+            if target_id:
+                relationships.uses[func_id].add(target_id)
+                relationships.used_by[target_id].add(func_id)
+            else:
+                unresolved.append((func_id, used_class))
+                
+    return relationships, unresolved
+
+def _process_file(file_path: str) -> Tuple[List[FunctionMetadata], List[ClassMetadata], Dict]:
+    """Process a single file and extract its metadata.
+    
+    Module-level so worker processes receive only the path, not the scraper.
+    """
+    try:
+        functions, classes = MetadataExtractor().process_file(file_path)
+        return functions, classes, RepositoryScraper.get_file_info(file_path)
+    except Exception as e:
+        print(f"Error processing {file_path}: {str(e)}")
+        return [], [], {}
 
 class RepositoryScraper:
     """Scrapes a repository to extract code structure and relationships."""
     
-    def __init__(self, repo_path: str, workers: int = 4):
+    def __init__(self, repo_path: str, workers: int = 4,
+                 file_hashes: Optional[Dict[str, str]] = None,
+                 per_file: Optional[Dict[str, Tuple[List[FunctionMetadata], List[ClassMetadata]]]] = None):
         self.repo_path = Path(repo_path)
         self.workers = workers
-        self.metadata_extractor = MetadataExtractor()
-        self.supported_extensions = {'.py', '.js', '.ts', '.java', '.cpp', '.c'}
+        self.supported_extensions = frozenset({'.py', '.js', '.ts', '.java', '.cpp', '.c'})
+        # Results of a previous scan, refreshed by scan_repository
+        self.file_hashes = file_hashes or {}
+        self.per_file = per_file or {}
         
     def is_valid_file(self, file_path: str) -> bool:
-        """Check if file should be processed."""
-        if not os.path.isfile(file_path):
-            return False
-            
-        extension = os.path.splitext(file_path)[1].lower()
-        if extension not in self.supported_extensions:
-            return False
-            
-        # Skip virtual environments and build directories
-        skip_patterns = {'venv', 'node_modules', '__pycache__', 'build', 'dist'}
-        return not any(pattern in file_path for pattern in skip_patterns)
+        """Check if file has a supported extension."""
+        # Slicing from the last dot is cheaper than os.path.splitext; names
+        # without a dot yield a single character that never matches
+        extension = file_path[file_path.rfind('.'):].lower()
+        return extension in self.supported_extensions
         
     def get_all_files(self) -> List[str]:
         """Get all valid files in the repository."""
         files = []
-        for root, _, filenames in os.walk(self.repo_path):
+        for root, dirs, filenames in os.walk(self.repo_path):
+            # Prune skipped directories so their contents are never listed; any
+            # name containing 'venv' (.venv, venv3, ...) is a virtual environment
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS and 'venv' not in d]
             for filename in filenames:
-                file_path = os.path.join(root, filename)
-                if self.is_valid_file(file_path):
-                    files.append(file_path)
+                if self.is_valid_file(filename):
+                    files.append(os.path.join(root, filename))
         return files
         
-    def process_file(self, file_path: str) -> Tuple[List[FunctionMetadata], List[ClassMetadata], Dict]:
-        """Process a single file and extract its metadata."""
+    @staticmethod
+    def get_file_info(file_path: str) -> Dict:
+        """Describe a file for the folder/file levels of the graph."""
+        return {
+            'path': file_path,
+            'type': os.path.splitext(file_path)[1],
+            'folder': os.path.dirname(file_path)
+        }
+        
+    def hash_file(self, file_path: str) -> Optional[str]:
+        """Hash the contents of a file to detect changes between scans."""
         try:
-            functions, classes = self.metadata_extractor.process_file(file_path)
-            file_info = {
-                'path': file_path,
-                'type': os.path.splitext(file_path)[1],
-                'folder': os.path.dirname(file_path)
-            }
-            return functions, classes, file_info
-        except Exception as e:
-            print(f"Error processing {file_path}: {str(e)}")
-            return [], [], {}
+            with open(file_path, 'rb') as f:
+                return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        except OSError:
+            return None
             
-    def extract_relationships(self, functions: List[FunctionMetadata], classes: List[ClassMetadata]) -> Dict:
+    def extract_relationships(self, functions: List[FunctionMetadata], classes: List[ClassMetadata]) -> Relationships:
         """Extract relationships between functions and classes."""
-        relationships = {}
-        
         # Create a map of class names to their IDs for easy lookup
-        class_name_map = {}
+        class_name_map = defaultdict(list)
         for cls in classes:
-            cls_id = f"{cls.file_path}:{cls.name}"
-            if cls.name not in class_name_map:
-                class_name_map[cls.name] = []
-            class_name_map[cls.name].append(cls_id)
-        
-        # Process classes
-        for cls in classes:
-            cls_id = f"{cls.file_path}:{cls.name}"
-            relationships[cls_id] = {'contains': set(), 'calls': set(), 'called_by': set(), 'uses': set(), 'used_by': set()}
+            class_name_map[cls.name].append(cls.id)
             
-            for method in cls.methods:
-                method_id = f"{method.file_path}:{method.name}"
-                relationships[cls_id]['contains'].add(method_id)
-                relationships[method_id] = {'calls': set(), 'called_by': set(), 'uses': set(), 'used_by': set()}
-        
-        # Initialize relationships for standalone functions
-        for func in functions:
-            func_id = f"{func.file_path}:{func.name}"
-            if func_id not in relationships:
-                relationships[func_id] = {'calls': set(), 'called_by': set(), 'uses': set(), 'used_by': set()}
-        
-        # Process function calls
-        for func in functions:
-            func_id = f"{func.file_path}:{func.name}"
+        # Same-file relationships never leave a file, so files are binned across
+        # workers and each bin is resolved independently
+        if self.workers > 1 and len(functions) + len(classes) >= PARALLEL_RELATIONSHIP_THRESHOLD:
+            class_bins = [[] for _ in range(self.workers)]
+            function_bins = [[] for _ in range(self.workers)]
+            for cls in classes:
+                class_bins[hash(cls.file_path) % self.workers].append(cls)
+            for func in functions:
+                function_bins[hash(func.file_path) % self.workers].append(func)
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                partials = list(executor.map(_build_partial_relationships, class_bins, function_bins))
+        else:
+            partials = [_build_partial_relationships(classes, functions)]
             
-            # Handle function calls
-            for called_name in func.called_functions:
-                same_file_call = f"{func.file_path}:{called_name}"
-                if same_file_call in relationships:
-                    relationships[func_id]['calls'].add(same_file_call)
-                    relationships[same_file_call]['called_by'].add(func_id)
+        # Bins hold disjoint files, so their node ids never collide
+        relationships = Relationships()
+        cross_file_usages = []
+        for partial, unresolved in partials:
+            relationships.update(partial)
+            cross_file_usages.extend(unresolved)
             
-            # Handle class usages
-            for used_class in func.used_classes:
-                # Check if the class exists in the same file first
-                same_file_class = f"{func.file_path}:{used_class}"
-                if same_file_class in relationships:
-                    relationships[func_id]['uses'].add(same_file_class)
-                    relationships[same_file_class]['used_by'].add(func_id)
-                # Then check across all files
-                elif used_class in class_name_map:
-                    for class_id in class_name_map[used_class]:
-                        relationships[func_id]['uses'].add(class_id)
-                        relationships[class_id]['used_by'].add(func_id)
-        
-        # Also process class methods
-        for cls in classes:
-            for method in cls.methods:
-                method_id = f"{method.file_path}:{method.name}"
-                
-                # Handle function calls from methods
-                for called_name in method.called_functions:
-                    same_file_call = f"{method.file_path}:{called_name}"
-                    if same_file_call in relationships:
-                        relationships[method_id]['calls'].add(same_file_call)
-                        relationships[same_file_call]['called_by'].add(method_id)
-                
-                # Handle class usages from methods
-                for used_class in method.used_classes:
-                    # Check if the class exists in the same file first
-                    same_file_class = f"{method.file_path}:{used_class}"
-                    if same_file_class in relationships:
-                        relationships[method_id]['uses'].add(same_file_class)
-                        relationships[same_file_class]['used_by'].add(method_id)
-                    # Then check across all files
-                    elif used_class in class_name_map:
-                        for class_id in class_name_map[used_class]:
-                            relationships[method_id]['uses'].add(class_id)
-                            relationships[class_id]['used_by'].add(method_id)
+        # Then check class usages across all files; ids from worker processes
+        # are not interned yet
+        for func_id, used_class in cross_file_usages:
+            func_id = sys.intern(func_id)
+            for class_id in class_name_map.get(used_class, ()):
+                relationships.uses[func_id].add(class_id)
+                relationships.used_by[class_id].add(func_id)
         
         return relationships
         
-    def scan_repository(self) -> Tuple[List[FunctionMetadata], List[ClassMetadata], Dict, Dict]:
+    def scan_repository(self) -> Tuple[List[FunctionMetadata], List[ClassMetadata], Dict, Relationships]:
         """Scan the repository and extract all metadata and relationships."""
         print("Scanning repository...")
         files = self.get_all_files()
         
-        # Process files in parallel
-        results = Parallel(n_jobs=self.workers)(
-            delayed(self.process_file)(f) for f in tqdm(files)
-        )
+        # Only re-parse files whose contents changed since the previous scan
+        hashes = {f: self.hash_file(f) for f in files}
+        stale = [
+            f for f in files
+            if hashes[f] is None or f not in self.per_file or self.file_hashes.get(f) != hashes[f]
+        ]
+        print(f"{len(files) - len(stale)} files unchanged, parsing {len(stale)} files")
+        
+        # Process changed files in parallel, batching files to amortize IPC
+        parsed = {}
+        if stale:
+            chunksize = max(1, len(stale) // (self.workers * 4))
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = executor.map(_process_file, stale, chunksize=chunksize)
+                parsed = dict(zip(stale, tqdm(results, total=len(stale))))
         
-        # Combine results
+        # Combine fresh and cached results, keeping the per-file cache up to date
         all_functions = []
         all_classes = []
         file_info = {}
-        for functions, classes, info in results:
-            if info:
-                file_info[info['path']] = info
+        file_hashes = {}
+        per_file = {}
+        for file_path in files:
+            if file_path in parsed:
+                functions, classes, info = parsed[file_path]
+                if not info:
+                    continue
+            else:
+                functions, classes = self.per_file[file_path]
+                info = self.get_file_info(file_path)
+                
+            if hashes[file_path] is not None:
+                file_hashes[file_path] = hashes[file_path]
+                per_file[file_path] = (functions, classes)
+            file_info[file_path] = info
             all_functions.extend(functions)
             all_classes.extend(classes)
+        self.file_hashes = file_hashes
+        self.per_file = per_file
             
         # Extract relationships
         relationships = self.extract_relationships(all_functions, all_classes)
         
-        return all_functions, all_classes, file_info, relationships 
\ No newline at end of file
+        return all_functions, all_classes, file_info, relationships
@@ -1,201 +1,483 @@
 import dash
-from dash import html, dcc
+from dash import html, dcc, Patch
 import dash_cytoscape as cyto
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output, State
-from typing import Dict, List, Tuple
-import json
-from filters import GraphFilter
-import colorsys
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from itertools import chain, repeat
 import hashlib
+import math
+import os
+from sys import intern
+import tempfile
+import networkx as nx
+import numpy as np
+import orjson
+import plotly.io as pio
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
+from filters import GraphFilter
+from metadata import ClassMetadata, FunctionMetadata, Relationships
+from zipfile import BadZipFile
+from zlib import crc32
+
+# Dash encodes callback responses through plotly's JSON helpers. The engine is
+# a process-wide setting, so it is switched to orjson once, on import.
+pio.json.config.default_engine = 'orjson'
+
+# Rules shared by every graph; folders get their color from the filter manager
+BASE_STYLESHEET = [
+    {
+        'selector': 'node',
+        'style': {
+            'label': 'data(label)',
+            'font-size': '12px',
+            'text-wrap': 'wrap',
+            'text-max-width': '100px'
+        }
+    },
+    {
+        'selector': '.folder',
+        'style': {
+            'shape': 'rectangle',
+            'width': '40px',
+            'height': '40px'
+        }
+    },
+    {
+        'selector': '.file',
+        'style': {
+            'background-color': 'data(color)',
+            'shape': 'diamond',
+            'width': '30px',
+            'height': '30px'
+        }
+    },
+    {
+        'selector': '.function',
+        'style': {
+            'background-color': 'data(color)',
+            'shape': 'ellipse',
+            'width': '25px',
+            'height': '25px'
+        }
+    },
+    {
+        'selector': '.method',
+        'style': {
+            'background-color': 'data(color)',
+            'shape': 'ellipse',
+            'width': '20px',
+            'height': '20px',
+            'border-width': '1px',
+            'border-color': '#000'
+        }
+    },
+    {
+        'selector': '.class',
+        'style': {
+            'background-color': 'data(color)',
+            'shape': 'round-rectangle',
+            'width': '35px',
+            'height': '35px'
+        }
+    },
+    {
+        'selector': '.uses-relationship',
+        'style': {
+            'curve-style': 'bezier',
+            'target-arrow-shape': 'diamond',
+            'line-color': '#0077cc',
+            'target-arrow-color': '#0077cc',
+            'line-style': 'dashed',
+            'opacity': 0.7
+        }
+    },
+    {
+        'selector': 'edge',
+        'style': {
+            'curve-style': 'bezier',  # Simpler edge style
+            'target-arrow-shape': 'triangle',
+            'arrow-scale': 1,
+            'line-color': '#666',
+            'target-arrow-color': '#666',
+            'opacity': 0.7,
+            'width': 2
+        }
+    },
+    {
+        'selector': '.relationship',
+        'style': {
+            'curve-style': 'bezier',
+            'target-arrow-shape': 'triangle',
+            'line-color': '#666',
+            'target-arrow-color': '#666',
+            'opacity': 0.7
+        }
+    },
+    {
+        'selector': '.highlighted',
+        'style': {
+            'line-color': '#f00',
+            'target-arrow-color': '#f00',
+            'opacity': 1,
+            'width': 3
+        }
+    },
+    {
+        'selector': ':selected',
+        'style': {
+            'border-width': 3,
+            'border-color': '#333'
+        }
+    }
+]
+
+# Above this many nodes, rendering switches to the cheaper styles below
+LARGE_GRAPH_THRESHOLD = 500
+
+# Appended after the regular rules so they take precedence: straight
+# haystack edges are the cheapest Cytoscape draws, and labels are skipped
+# while they would be too small to read
+LARGE_GRAPH_STYLESHEET = [
+    {
+        'selector': 'node',
+        'style': {
+            'min-zoomed-font-size': 8,
+            'text-wrap': 'none'
+        }
+    },
+    {
+        'selector': 'edge',
+        'style': {
+            'curve-style': 'haystack',
+            'haystack-radius': 0
+        }
+    }
+]
+
+# Seconds a selection's visible node set stays memoized
+VISIBLE_NODES_CACHE_TIMEOUT = 300
+
+# Layout scale per square root of the node count, keeping node density
+# roughly constant as graphs grow
+LAYOUT_SPACING = 150
+
+# Spring layout parameters; the seed keeps positions stable across runs. The
+# iteration count shrinks from LAYOUT_ITERATIONS towards LAYOUT_MIN_ITERATIONS
+# so that iterations * nodes^2 stays within LAYOUT_WORK.
+LAYOUT_ITERATIONS = 200
+LAYOUT_MIN_ITERATIONS = 50
+LAYOUT_WORK = 200 * 100 ** 2
+LAYOUT_SEED = 42
+
+# Force-directed layout run over the displayed graph on request, starting
+# from the precomputed positions
+RELAYOUT = {
+    'name': 'cola',
+    'nodeSpacing': 100,
+    'edgeLength': 200,
+    'padding': 50,
+    'animate': True,
+    'maxSimulationTime': 3000,
+    'fit': False,  # Don't reset view when updating
+    'avoidOverlap': True
+}
+
+# Applied to call and usage edges leaving the selected file in single-file mode
+CROSS_FILE_HIGHLIGHT_STYLE = {
+    'line-color': '#ff5722',  # Bright orange for cross-file connections
+    'target-arrow-color': '#ff5722',
+    'width': 3,
+    'opacity': 1,
+    'z-index': 10  # Make sure these connections are on top
+}
+
+def _render_callable_details(node_data: Dict, metadata: FunctionMetadata) -> html.Div:
+    """Render the details panel of a function or method."""
+    return html.Div([
+        html.H5(node_data['label']),
+        html.P(f"Type: {node_data['type'].capitalize()}"),
+        html.P(f"File: {metadata.file_path}"),
+        html.P(f"Line: {metadata.line_number}"),
+        html.H6("Docstring:"),
+        html.P(metadata.docstring or "No docstring"),
+        html.H6("Parameters:"),
+        html.Ul([html.Li(f"{param['name']}: {param['type']}") for param in metadata.parameters]),
+        html.H6("Returns:"),
+        html.P(metadata.returns)
+    ])
+
+def _render_class_details(node_data: Dict, metadata: ClassMetadata) -> html.Div:
+    """Render the details panel of a class."""
+    return html.Div([
+        html.H5(node_data['label']),
+        html.P("Type: Class"),
+        html.P(f"File: {metadata.file_path}"),
+        html.H6("Docstring:"),
+        html.P(metadata.docstring or "No docstring")
+    ])
+
+def _render_node_details(node_data: Dict, metadata: Optional[Union[ClassMetadata, FunctionMetadata]]) -> html.Div:
+    """Render the details panel of a folder or file."""
+    return html.Div([
+        html.H5(node_data['label']),
+        html.P(f"Type: {node_data['type'].capitalize()}")
+    ])
+
+# Details panel renderers by node type; other types use _render_node_details
+_NODE_DETAIL_RENDERERS = {
+    'function': _render_callable_details,
+    'method': _render_callable_details,
+    'class': _render_class_details
+}
+
+class OrJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, falling back to Flask's conversions."""
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+        
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+@dataclass(slots=True)
+class NodeTable:
+    """Graph nodes stored column-wise; row i of every column describes the same node.
+    
+    Cytoscape element dicts are only materialized for serialization.
+    """
+    ids: List[str] = field(default_factory=list)
+    labels: List[str] = field(default_factory=list)
+    types: List[str] = field(default_factory=list)
+    colors: List[Optional[str]] = field(default_factory=list)
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+        
+    def extend(self, node_type: str, ids: Sequence[str], labels: Sequence[str],
+               colors: Optional[Sequence[str]] = None):
+        """Append a group of nodes of one type given as parallel sequences."""
+        count = len(ids)
+        self.ids.extend(ids)
+        self.labels.extend(labels)
+        self.types.extend(repeat(node_type, count))
+        self.colors.extend(repeat(None, count) if colors is None else colors)
+        
+    def to_elements(self) -> List[Dict]:
+        """Materialize the nodes as Cytoscape elements, leaving out empty fields.
+        
+        Only fields read by the stylesheet and the callbacks are included; node
+        details are looked up on the server when a node is tapped.
+        """
+        elements = []
+        for node_id, label, node_type, color in zip(self.ids, self.labels, self.types, self.colors):
+            data = {'id': node_id, 'label': label, 'type': node_type}
+            if color is not None:
+                data['color'] = color
+            elements.append({'data': data, 'classes': node_type})
+        return elements
+
+@dataclass(slots=True)
+class EdgeTable:
+    """Graph edges stored column-wise, like NodeTable."""
+    sources: List[str] = field(default_factory=list)
+    targets: List[str] = field(default_factory=list)
+    types: List[str] = field(default_factory=list)
+    classes: List[Optional[str]] = field(default_factory=list)
+    
+    def __len__(self) -> int:
+        return len(self.sources)
+        
+    def extend(self, edge_type: str, sources: Sequence[str], targets: Sequence[str],
+               edge_class: Optional[str] = None):
+        """Append a group of edges of one type given as parallel sequences."""
+        count = len(sources)
+        self.sources.extend(sources)
+        self.targets.extend(targets)
+        self.types.extend(repeat(edge_type, count))
+        self.classes.extend(repeat(edge_class, count))
+        
+    def to_elements(self) -> List[Dict]:
+        """Materialize the edges as Cytoscape elements."""
+        elements = []
+        for source, target, edge_type, edge_class in zip(self.sources, self.targets, self.types, self.classes):
+            edge = {'data': {'source': source, 'target': target, 'type': edge_type}}
+            if edge_class is not None:
+                edge['classes'] = edge_class
+            elements.append(edge)
+        return elements
 
 class GraphVisualizer:
     """Handles the interactive visualization of the code graph."""
     
-    def __init__(self, functions: List, classes: List, file_info: Dict, relationships: Dict):
+    def __init__(self, functions: List, classes: List, file_info: Dict, relationships: Relationships,
+                 layout_cache: Optional[str] = None):
         self.functions = functions
         self.classes = classes
         self.file_info = file_info
         self.relationships = relationships
+        # Optional .npz file keeping node positions between runs
+        self.layout_cache = layout_cache
         self.filter_manager = GraphFilter()
-        # Register the layout we'll use
+        # File colors (computed for all files at once), and the interned node ids
+        # and display names of files and folders, shared by the graph, the
+        # selector and the callbacks. Folders are collected in the same pass, in
+        # first-seen order so the graph payload, and the hash in its URL, are
+        # the same on every run. All maps of files follow the order of file_info.
+        self._file_colors = dict(zip(self.file_info, self._get_file_colors(list(self.file_info))))
+        self._file_node_id = {}
+        self._file_name = {}
+        self._file_folder_id = {}
+        self._folder_node_id = {}
+        self._folder_name = {}
+        for file_path, info in self.file_info.items():
+            self._file_node_id[file_path] = intern('file:' + file_path)
+            self._file_name[file_path] = self._get_base_name(file_path)
+            folder = info['folder']
+            if folder not in self._folder_node_id:
+                self._folder_node_id[folder] = intern('folder:' + folder)
+                self._folder_name[folder] = self._get_base_name(folder)
+            self._file_folder_id[file_path] = self._folder_node_id[folder]
+        # The graph never changes during a session, so build it once and index
+        # it for the callbacks
+        self._nodes, self._edges = self._create_nodes_and_edges()
+        # Details are looked up when a node is tapped instead of shipping them
+        # with every node. Definitions are visited in node order and the first
+        # one per id is kept, matching the node drawn for a shared id.
+        self._meta_by_id: Dict[str, Union[ClassMetadata, FunctionMetadata]] = {}
+        for item in chain(self.classes, (m for cls in self.classes for m in cls.methods), self.functions):
+            self._meta_by_id.setdefault(item.id, item)
+        # Containment hierarchy in both directions: the children of each folder,
+        # file and class, and the containers of each node (normally one; ids of
+        # same-named definitions in a file collide)
+        self._contains_children = defaultdict(list)
+        self._contains_parents = defaultdict(list)
+        # Adjacency over the call and class usage edges of the graph
+        self._out_calls = defaultdict(set)
+        self._in_calls = defaultdict(set)
+        for source, target, edge_type in zip(self._edges.sources, self._edges.targets, self._edges.types):
+            if edge_type == 'contains':
+                self._contains_children[source].append(target)
+                self._contains_parents[target].append(source)
+            else:
+                self._out_calls[source].add(target)
+                self._in_calls[target].add(source)
+        # Selector options are static too; the dropdown searches them in the browser
+        self._folder_file_items = self._get_folder_file_items()
+        self._base_stylesheet = self._create_stylesheet()
+        # Large graphs start with folders and files only; a file's contents
+        # are added in the browser when it is tapped or selected
+        self._level_of_detail = len(self._nodes) > LARGE_GRAPH_THRESHOLD
+        self._positions = self._compute_positions()
+        # Register the layout used by the re-layout button
         cyto.load_extra_layouts()
         self.app = self._create_app()
         
-    def _create_nodes_and_edges(self, filtered_nodes: Dict = None) -> Tuple[List, List]:
-        """Create nodes and edges for the graph visualization."""
-        nodes = []
-        edges = []
-        
-        # Generate a color map for files
-        def get_file_color(file_path: str) -> str:
-            """Generate a consistent color based on file path."""
-            hash_value = int(hashlib.md5(file_path.encode()).hexdigest(), 16)
-            hue = (hash_value % 1000) / 1000.0
-            rgb = colorsys.hsv_to_rgb(hue, 0.7, 0.9)
-            return f'rgb({int(rgb[0]*255)}, {int(rgb[1]*255)}, {int(rgb[2]*255)})'
-
-        # Create color map for files
-        file_colors = {file_path: get_file_color(file_path) 
-                      for file_path in self.file_info.keys()}
-        
-        # Keep track of methods that belong to classes
-        methods_in_classes = set()
-        
-        # Add folder nodes
-        folders = set(info['folder'] for info in self.file_info.values())
-        for folder in folders:
-            nodes.append({
-                'data': {
-                    'id': f"folder:{folder}",
-                    'label': folder.split('/')[-1],
-                    'type': 'folder'
-                },
-                'classes': 'folder'
-            })
-            
-        # Add file nodes
-        for file_path, info in self.file_info.items():
-            nodes.append({
-                'data': {
-                    'id': f"file:{file_path}",
-                    'label': file_path.split('/')[-1],
-                    'type': 'file',
-                    'extension': info['type'],
-                    'color': file_colors[file_path]
-                },
-                'classes': 'file'
-            })
-            # Connect folder to file
-            edges.append({
-                'data': {
-                    'source': f"folder:{info['folder']}",
-                    'target': f"file:{file_path}",
-                    'type': 'contains'
-                }
-            })
-            
-        # Add class nodes and their methods
-        for cls in self.classes:
-            cls_id = f"{cls.file_path}:{cls.name}"
-            nodes.append({
-                'data': {
-                    'id': cls_id,
-                    'label': cls.name,
-                    'type': 'class',
-                    'color': file_colors[cls.file_path],
-                    'metadata': {
-                        'docstring': cls.docstring,
-                        'file_path': cls.file_path
-                    }
-                },
-                'classes': 'class'
-            })
-            # Connect file to class
-            edges.append({
-                'data': {
-                    'source': f"file:{cls.file_path}",
-                    'target': cls_id,
-                    'type': 'contains'
-                }
-            })
-            
-            # Connect class to its methods
-            for method in cls.methods:
-                method_id = f"{method.file_path}:{method.name}"
-                # Track this method as belonging to a class
-                methods_in_classes.add(method_id)
-                
-                nodes.append({
-                    'data': {
-                        'id': method_id,
-                        'label': method.name,
-                        'type': 'method',
-                        'color': file_colors[method.file_path],
-                        'metadata': {
-                            'docstring': method.docstring,
-                            'parameters': method.parameters,
-                            'returns': method.returns,
-                            'file_path': method.file_path,
-                            'line_number': method.line_number
-                        }
-                    },
-                    'classes': 'method'
-                })
-                # Connect method to its class (not to the file)
-                edges.append({
-                    'data': {
-                        'source': cls_id,
-                        'target': method_id,
-                        'type': 'contains'
-                    }
-                })
-        
-        # Add standalone function nodes (functions not in classes)
-        for func in self.functions:
-            func_id = f"{func.file_path}:{func.name}"
-            # Skip functions that are already added as methods
-            if func_id in methods_in_classes:
-                continue
-            
-            nodes.append({
-                'data': {
-                    'id': func_id,
-                    'label': func.name,
-                    'type': 'function',
-                    'color': file_colors[func.file_path],
-                    'metadata': {
-                        'docstring': func.docstring,
-                        'parameters': func.parameters,
-                        'returns': func.returns,
-                        'file_path': func.file_path,
-                        'line_number': func.line_number
-                    }
-                },
-                'classes': 'function'
-            })
-            # Connect function to file
-            edges.append({
-                'data': {
-                    'source': f"file:{func.file_path}",
-                    'target': func_id,
-                    'type': 'contains'
-                }
-            })
+    @staticmethod
+    def _get_base_name(path: str) -> str:
+        """Get the last component of a file or folder path, for either separator."""
+        return intern(path[max(path.rfind('/'), path.rfind('\\')) + 1:])
         
-        # Add relationship edges (calls between functions/methods)
-        for func_id, rels in self.relationships.items():
-            source_file = func_id.split(':')[0]
-            
-            for called_func in rels.get('calls', set()):
-                target_file = called_func.split(':')[0]
-                
-                # Only add the edge if the source and target are in the same file
-                if source_file == target_file:
-                    edges.append({
-                        'data': {
-                            'source': func_id,
-                            'target': called_func,
-                            'type': 'calls'
-                        },
-                        'classes': 'relationship'
-                    })
+    @staticmethod
+    def _get_file_colors(file_paths: List[str]) -> List[str]:
+        """Generate a consistent color for each file path."""
+        # The palette only needs a stable spread, not a cryptographic hash
+        hues = np.fromiter((crc32(path.encode()) % 1000 for path in file_paths),
+                           dtype=np.float64, count=len(file_paths)) / 1000.0
+        
+        # HSV -> RGB for all files at once, as colorsys.hsv_to_rgb(hue, 0.7, 0.9)
+        s, v = 0.7, 0.9
+        sector = (hues * 6.0).astype(np.int64)
+        f = hues * 6.0 - sector
+        p = np.full_like(hues, v * (1.0 - s))
+        q = v * (1.0 - s * f)
+        t = v * (1.0 - s * (1.0 - f))
+        v = np.full_like(hues, v)
+        sector %= 6
+        rgb = np.stack([
+            np.choose(sector, (v, q, p, p, t, v)),
+            np.choose(sector, (t, v, v, q, p, p)),
+            np.choose(sector, (p, p, t, v, v, q)),
+        ], axis=1)
+        rgb = (rgb * 255).astype(np.uint8).tolist()
+        return [f'rgb({r}, {g}, {b})' for r, g, b in rgb]
+        
+    def _create_nodes_and_edges(self) -> Tuple[NodeTable, EdgeTable]:
+        """Create the nodes and edges of the whole graph; called once from __init__."""
+        file_color = self._file_colors.__getitem__
+        nodes = NodeTable()
+        edges = EdgeTable()
+        
+        # Ids and labels are interned, and every edge endpoint reuses its node's id
+        # object, so repeated strings are stored once
+        folder_ids = self._folder_node_id
+        file_ids = self._file_node_id
+        
+        # Add folder and file nodes
+        nodes.extend('folder', list(folder_ids.values()), list(self._folder_name.values()))
+        nodes.extend('file', list(file_ids.values()), list(self._file_name.values()),
+                     colors=list(self._file_colors.values()))
+        
+        # Same-named definitions of a file share an id (e.g. the __init__ of every
+        # class in it), and Cytoscape only creates the first element per id, so
+        # only the first definition of each id becomes a node
+        seen = set()
+        def first_of_id(items):
+            return [item for item in items if item.id not in seen and not seen.add(item.id)]
             
-            # Add class usage relationships
-            for used_class in rels.get('uses', set()):
-                class_file = used_class.split(':')[0]
-                
-                # Only add the edge if in the same file
-                if source_file == class_file:
-                    edges.append({
-                        'data': {
-                            'source': func_id,
-                            'target': used_class,
-                            'type': 'uses'
-                        },
-                        'classes': 'uses-relationship'
-                    })
+        # Add class nodes, then their methods
+        classes = first_of_id(self.classes)
+        nodes.extend(
+            'class',
+            [cls.id for cls in classes],
+            [intern(cls.name) for cls in classes],
+            colors=[file_color(cls.file_path) for cls in classes]
+        )
+        methods = first_of_id(method for cls in self.classes for method in cls.methods)
+        nodes.extend(
+            'method',
+            [method.id for method in methods],
+            [intern(method.name) for method in methods],
+            colors=[file_color(method.file_path) for method in methods]
+        )
+        
+        # Add standalone function nodes, skipping functions already added as methods
+        standalone = first_of_id(self.functions)
+        nodes.extend(
+            'function',
+            [func.id for func in standalone],
+            [intern(func.name) for func in standalone],
+            colors=[file_color(func.file_path) for func in standalone]
+        )
+        
+        # Connect folders to files, files to classes and functions, classes to
+        # their methods (each distinct pair once)
+        class_methods = list(dict.fromkeys((cls.id, method.id) for cls in self.classes for method in cls.methods))
+        edges.extend('contains', list(self._file_folder_id.values()), list(file_ids.values()))
+        edges.extend('contains', [file_ids[cls.file_path] for cls in classes], [cls.id for cls in classes])
+        edges.extend('contains', [cls_id for cls_id, _ in class_methods], [method_id for _, method_id in class_methods])
+        edges.extend('contains', [file_ids[func.file_path] for func in standalone], [func.id for func in standalone])
         
+        # Add call and class usage edges, only between elements of the same file
+        for relations, edge_type, edge_class in (
+            (self.relationships.calls, 'calls', 'relationship'),
+            (self.relationships.uses, 'uses', 'uses-relationship')
+        ):
+            pairs = []
+            for func_id, targets in relations.items():
+                # Ids are '<file path>:<name>', so same-file targets share the
+                # source's prefix; drop the others before sorting
+                file_prefix = func_id[:func_id.rindex(':') + 1]
+                pairs.extend(
+                    (func_id, target)
+                    for target in sorted(target for target in targets if target.startswith(file_prefix))
+                )
+            edges.extend(edge_type, [source for source, _ in pairs], [target for _, target in pairs], edge_class)
+            
         return nodes, edges
 
     def _get_folder_file_items(self):
@@ -203,34 +485,220 @@ class GraphVisualizer:
         items = []
         
         # Add folders
-        folders = set(info['folder'] for info in self.file_info.values())
-        for folder in folders:
-            folder_name = folder.split('\\')[-1] if '\\' in folder else folder.split('/')[-1]
+        for folder, folder_id in self._folder_node_id.items():
             items.append({
-                'label': f"📁 {folder_name}",
-                'value': f"folder:{folder}"
+                'label': f"📁 {self._folder_name[folder]}",
+                'value': folder_id
             })
         
         # Add files
-        for file_path in self.file_info:
-            file_name = file_path.split('\\')[-1] if '\\' in file_path else file_path.split('/')[-1]
+        for file_path, file_id in self._file_node_id.items():
             items.append({
-                'label': f"📄 {file_name}",
-                'value': f"file:{file_path}"
+                'label': f"📄 {self._file_name[file_path]}",
+                'value': file_id
             })
         
         return items
 
+    def _create_stylesheet(self) -> List[Dict]:
+        """Create the static part of the graph stylesheet."""
+        folder_color = self.filter_manager.folder_color
+        stylesheet = [
+            {'selector': rule['selector'], 'style': {'background-color': folder_color, **rule['style']}}
+            if rule['selector'] == '.folder' else rule
+            for rule in BASE_STYLESHEET
+        ]
+        if len(self._nodes) > LARGE_GRAPH_THRESHOLD:
+            stylesheet.extend(LARGE_GRAPH_STYLESHEET)
+        return stylesheet
+        
+    def _compute_positions(self) -> Dict[str, Dict[str, float]]:
+        """Lay out the initially displayed nodes once, server-side.
+        
+        The browser then only places nodes at these positions. In level-of-detail
+        mode only folders and files are laid out, as stars without physics; file
+        contents are placed around their file when they are added.
+        """
+        if self._level_of_detail:
+            return self._compute_skeleton_positions()
+            
+        nodes, edges = self._nodes, self._edges
+        graph = nx.DiGraph()
+        graph.add_nodes_from(nodes.ids)
+        graph.add_edges_from(zip(edges.sources, edges.targets))
+        if not graph:
+            return {}
+            
+        # Each iteration costs O(n^2), so larger graphs get fewer iterations
+        # (down to networkx's default) to bound the startup time
+        iterations = max(LAYOUT_MIN_ITERATIONS, min(LAYOUT_ITERATIONS, LAYOUT_WORK // len(graph) ** 2))
+        
+        # The layout is deterministic, so positions computed by a previous run
+        # for the same graph and parameters are reused as they are
+        scale = LAYOUT_SPACING * math.sqrt(len(graph))
+        key = hashlib.blake2b(
+            orjson.dumps([list(graph.nodes), list(graph.edges), iterations, LAYOUT_SEED, scale]),
+            digest_size=16
+        ).hexdigest()
+        cached = self._load_positions(key)
+        if cached is not None:
+            return cached
+            
+        positions = nx.spring_layout(graph, iterations=iterations, seed=LAYOUT_SEED, scale=scale)
+        self._save_positions(key, positions)
+        return {node_id: {'x': float(x), 'y': float(y)} for node_id, (x, y) in positions.items()}
+        
+    def _compute_skeleton_positions(self) -> Dict[str, Dict[str, float]]:
+        """Place each folder with its files on a ring around it, packing the stars in rows.
+        
+        The skeleton only has folder -> file edges, so it is a set of disjoint
+        stars that can be laid out directly in O(n).
+        """
+        stars = []
+        for folder_id in self._folder_node_id.values():
+            files = self._contains_children.get(folder_id, ())
+            # Neighbouring files on the ring are about LAYOUT_SPACING apart
+            radius = max(LAYOUT_SPACING, len(files) * LAYOUT_SPACING / (2 * math.pi))
+            stars.append((folder_id, files, radius))
+            
+        # Rows about as wide as a square holding all stars
+        row_width = math.sqrt(sum((2 * radius + LAYOUT_SPACING) ** 2 for _, _, radius in stars))
+        positions = {}
+        x = y = row_height = 0.0
+        for folder_id, files, radius in stars:
+            size = 2 * radius + LAYOUT_SPACING
+            if x > 0 and x + size > row_width:
+                x = 0.0
+                y += row_height
+                row_height = 0.0
+            cx, cy = x + size / 2, y + size / 2
+            positions[folder_id] = {'x': cx, 'y': cy}
+            for i, file_id in enumerate(files):
+                angle = 2 * math.pi * i / len(files)
+                positions[file_id] = {'x': cx + radius * math.cos(angle), 'y': cy + radius * math.sin(angle)}
+            x += size
+            row_height = max(row_height, size)
+        return positions
+        
+    def _load_positions(self, key: str) -> Optional[Dict[str, Dict[str, float]]]:
+        """Load the positions saved for the layout key, if the cache holds them."""
+        if not self.layout_cache or not os.path.exists(self.layout_cache):
+            return None
+        try:
+            with np.load(self.layout_cache) as cache:
+                if str(cache['key']) != key:
+                    return None
+                ids = cache['ids'].tolist()
+                xy = cache['xy'].tolist()
+        except (OSError, ValueError, KeyError, EOFError, BadZipFile) as e:
+            # The cache can always be rebuilt, so unreadable files fall back to a new layout
+            print(f"Layout cache loading failed: {str(e)}")
+            return None
+        return {node_id: {'x': x, 'y': y} for node_id, (x, y) in zip(ids, xy)}
+        
+    def _save_positions(self, key: str, positions: Dict[str, np.ndarray]):
+        """Save the positions computed for the layout key, replacing older ones.
+        
+        The file is written next to the cache and moved into place, so an
+        interrupted run never leaves a truncated cache behind.
+        """
+        if not self.layout_cache:
+            return
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(self.layout_cache)),
+                                             suffix='.tmp', delete=False) as f:
+                tmp_path = f.name
+                np.savez_compressed(
+                    f,
+                    key=np.array(key),
+                    ids=np.array(list(positions)),
+                    xy=np.array(list(positions.values()), dtype=np.float64).reshape(-1, 2)
+                )
+            os.replace(tmp_path, self.layout_cache)
+        except OSError as e:
+            print(f"Failed to save layout cache: {str(e)}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+    def _create_graph_payload(self) -> Dict:
+        """Create the graph payload served by _register_graph_route.
+        
+        Nodes carry their precomputed positions. In level-of-detail mode the
+        top-level elements are the folders and files only, and the remaining
+        elements are grouped per file node id under 'subgraphs'.
+        """
+        nodes = self._nodes.to_elements()
+        edges = self._edges.to_elements()
+        positions = self._positions
+        if not self._level_of_detail:
+            for node in nodes:
+                node['position'] = positions[node['data']['id']]
+            return {'nodes': nodes, 'edges': edges}
+            
+        skeleton_nodes = []
+        skeleton_edges = []
+        subgraphs = defaultdict(list)
+        for node in nodes:
+            node_id = node['data']['id']
+            if node_id in positions:
+                node['position'] = positions[node_id]
+                skeleton_nodes.append(node)
+            else:
+                # Code element ids are '<file path>:<name>'
+                subgraphs[self._file_node_id[node_id.rsplit(':', 1)[0]]].append(node)
+        for edge in edges:
+            source = edge['data']['source']
+            if source.startswith('folder:'):
+                skeleton_edges.append(edge)
+            else:
+                # Other edges never leave a file, so they go with their target
+                subgraphs[self._file_node_id[edge['data']['target'].rsplit(':', 1)[0]]].append(edge)
+        return {'nodes': skeleton_nodes, 'edges': skeleton_edges, 'subgraphs': subgraphs}
+        
+    def _register_graph_route(self, app: dash.Dash) -> str:
+        """Serve the graph elements from memory on their own route and return its URL.
+        
+        The route carries a hash of the contents, so browsers can keep the
+        graph cached between sessions and refetch it only when it changes.
+        Nothing is written to disk, so several viewers can run from the same
+        installation, read-only ones included.
+        """
+        payload = orjson.dumps(self._create_graph_payload())
+        name = f"graph-{hashlib.blake2b(payload, digest_size=8).hexdigest()}.json"
+        app.server.add_url_rule(
+            f"{app.config.routes_pathname_prefix}_graph/{name}",
+            endpoint='graph_payload',
+            view_func=lambda: Response(payload, mimetype='application/json',
+                                       headers={'Cache-Control': 'public, max-age=31536000, immutable'})
+        )
+        return app.get_relative_path(f"/_graph/{name}")
+        
     def _create_app(self) -> dash.Dash:
         """Create the Dash application for visualization."""
         app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
-        
-        nodes, edges = self._create_nodes_and_edges()
-        folder_file_items = self._get_folder_file_items()
+        # Endpoints other than callback responses encode through Flask's provider
+        app.server.json = OrJSONProvider(app.server)
+        graph_url = self._register_graph_route(app)
         
         app.layout = dbc.Container([
             html.H1("Code Repository Graph Viewer", className="my-4"),
             
+            # The browser fetches the elements as a separate, cacheable file
+            # instead of receiving them inside the layout
+            dcc.Store(id='graph-url', data=graph_url),
+            # Per-file elements not loaded yet in level-of-detail mode
+            dcc.Store(id='subgraph-cache'),
+            # Elements are sent once; filtering only sends node ids and swaps
+            # the stylesheet, so elements are never replaced or laid out again
+            dcc.Store(id='stylesheet-parts', data={
+                'base': self._base_stylesheet,
+                'cross_file': CROSS_FILE_HIGHLIGHT_STYLE
+            }),
+            dcc.Store(id='selection-debounced'),
+            dcc.Store(id='visible-nodes'),
+            dcc.Store(id='applied-selection'),
+            
             dbc.Row([
                 dbc.Col([
                     dbc.Card([
@@ -239,7 +707,7 @@ class GraphVisualizer:
                             html.P("Select folders and files to display:"),
                             dcc.Dropdown(
                                 id='folder-file-selector',
-                                options=folder_file_items,
+                                options=self._folder_file_items,
                                 value=[],  # Default to empty selection
                                 multi=True,  # Enable multi-selection
                                 clearable=True,
@@ -258,142 +726,16 @@ class GraphVisualizer:
                 ], width=3),
                 
                 dbc.Col([
+                    dbc.Button("Re-layout", id='relayout-button', color='secondary',
+                               size='sm', className="mb-2"),
                     cyto.Cytoscape(
                         id='graph',
-                        layout={
-                            'name': 'cose',
-                            'padding': 50,
-                            'nodeOverlap': 20,
-                            'componentSpacing': 100,
-                            'nodeRepulsion': 400000,
-                            'idealEdgeLength': 100,
-                            'edgeElasticity': 100,
-                            'nestingFactor': 5,
-                            'gravity': 80,
-                            'numIter': 1000,
-                            'initialTemp': 200,
-                            'coolingFactor': 0.95,
-                            'minTemp': 1.0
-                        },
+                        # Positions are computed by the server
+                        layout={'name': 'preset', 'fit': True},
                         style={'width': '100%', 'height': '800px'},
-                        elements=nodes + edges,
-                        stylesheet=[
-                            {
-                                'selector': 'node',
-                                'style': {
-                                    'label': 'data(label)',
-                                    'font-size': '12px',
-                                    'text-wrap': 'wrap',
-                                    'text-max-width': '100px'
-                                }
-                            },
-                            {
-                                'selector': '.folder',
-                                'style': {
-                                    'background-color': self.filter_manager.folder_color,
-                                    'shape': 'rectangle',
-                                    'width': '40px',
-                                    'height': '40px'
-                                }
-                            },
-                            {
-                                'selector': '.file',
-                                'style': {
-                                    'background-color': 'data(color)',
-                                    'shape': 'diamond',
-                                    'width': '30px',
-                                    'height': '30px'
-                                }
-                            },
-                            {
-                                'selector': '.function',
-                                'style': {
-                                    'background-color': 'data(color)',
-                                    'shape': 'ellipse',
-                                    'width': '25px',
-                                    'height': '25px'
-                                }
-                            },
-                            {
-                                'selector': '.method',
-                                'style': {
-                                    'background-color': 'data(color)',
-                                    'shape': 'ellipse',
-                                    'width': '20px',
-                                    'height': '20px',
-                                    'border-width': '1px',
-                                    'border-color': '#000'
-                                }
-                            },
-                            {
-                                'selector': '.class',
-                                'style': {
-                                    'background-color': 'data(color)',
-                                    'shape': 'round-rectangle',
-                                    'width': '35px',
-                                    'height': '35px'
-                                }
-                            },
-                            {
-                                'selector': '.uses-relationship',
-                                'style': {
-                                    'curve-style': 'bezier',
-                                    'target-arrow-shape': 'diamond',
-                                    'line-color': '#0077cc',
-                                    'target-arrow-color': '#0077cc',
-                                    'line-style': 'dashed',
-                                    'opacity': 0.7
-                                }
-                            },
-                            {
-                                'selector': 'edge',
-                                'style': {
-                                    'curve-style': 'bezier',  # Simpler edge style
-                                    'target-arrow-shape': 'triangle',
-                                    'arrow-scale': 1,
-                                    'line-color': '#666',
-                                    'target-arrow-color': '#666',
-                                    'opacity': 0.7,
-                                    'width': 2
-                                }
-                            },
-                            {
-                                'selector': '.relationship',
-                                'style': {
-                                    'curve-style': 'bezier',
-                                    'target-arrow-shape': 'triangle',
-                                    'line-color': '#666',
-                                    'target-arrow-color': '#666',
-                                    'opacity': 0.7
-                                }
-                            },
-                            {
-                                'selector': '.highlighted',
-                                'style': {
-                                    'line-color': '#f00',
-                                    'target-arrow-color': '#f00',
-                                    'opacity': 1,
-                                    'width': 3
-                                }
-                            },
-                            {
-                                'selector': ':selected',
-                                'style': {
-                                    'border-width': 3,
-                                    'border-color': '#333'
-                                }
-                            },
-                            {
-                                'selector': '.cross-file-highlight',
-                                'style': {
-                                    'line-color': '#ff5722',  # Bright orange for cross-file connections
-                                    'target-arrow-color': '#ff5722',
-                                    'width': 3,
-                                    'opacity': 1,
-                                    'z-index': 10  # Make sure these connections are on top
-                                }
-                            }
-                        ],
+                        # Fetched clientside from the in-memory graph route
+                        elements=[],
+                        stylesheet=self._base_stylesheet,
                         # Add zoom and pan settings
                         userZoomingEnabled=True,
                         userPanningEnabled=True,
@@ -411,134 +753,167 @@ class GraphVisualizer:
         self._setup_callbacks(app)
         return app
         
+    def _compute_visible_nodes(self, selected_items: List[str]) -> Optional[Tuple[Set[str], Optional[str]]]:
+        """Compute the ids of the nodes to display for a folder/file selection.
+        
+        Returns None when everything is displayed, otherwise the node ids and,
+        in single-file mode, the path of the selected file.
+        """
+        # If no selections, show everything
+        if not selected_items:
+            return None
+            
+        # Separate selected folders and files in one pass over the selection
+        selected_folders = []
+        selected_files = []
+        for item in selected_items:
+            (selected_folders if item.startswith('folder:') else selected_files).append(item)
+        
+        # Keep track of nodes to display
+        keep_nodes = set()
+        
+        # Always include the selected folders and files
+        keep_nodes.update(selected_folders)
+        keep_nodes.update(selected_files)
+        
+        # For each selected folder, add all its contained files
+        for folder in selected_folders:
+            keep_nodes.update(self._contains_children.get(folder, ()))
+        
+        # For each selected file, add all its contained classes and functions
+        file_content_nodes = set()
+        pending = deque(selected_files)
+        
+        # Walk the hierarchy breadth-first (file -> class -> method)
+        while pending:
+            for child in self._contains_children.get(pending.popleft(), ()):
+                if child not in file_content_nodes:
+                    file_content_nodes.add(child)
+                    pending.append(child)
+        
+        # Add all content nodes to our keep set
+        keep_nodes.update(file_content_nodes)
+        
+        # Special case: if only one file is selected, show its cross-file connections
+        if len(selected_files) == 1 and not selected_folders:
+            # Get all nodes from the selected file
+            file_nodes = set()
+            for node in file_content_nodes:
+                file_nodes.add(node)
+        
+            # Add nodes from other files that are connected to our file's nodes
+            connected_nodes = set()
+            for node_id in file_nodes:
+                connected_nodes.update(self._out_calls.get(node_id, ()))
+                connected_nodes.update(self._in_calls.get(node_id, ()))
+            connected_nodes -= file_nodes
+        
+            # For nodes from other files, add their parent nodes to show context
+            context_nodes = set()
+            for node_id in connected_nodes:
+                # Find parent nodes (files or classes)
+                for parent_id in self._contains_parents.get(node_id, ()):
+                    context_nodes.add(parent_id)
+                    
+                    # If parent is a class, also add its file
+                    if not parent_id.startswith('file:'):
+                        context_nodes.update(self._contains_parents.get(parent_id, ()))
+        
+            # Add all connected and context nodes to our keep set
+            keep_nodes.update(connected_nodes)
+            keep_nodes.update(context_nodes)
+        
+        single_file = len(selected_files) == 1 and not selected_folders
+        return keep_nodes, (selected_files[0][len('file:'):] if single_file else None)
+        
     def _setup_callbacks(self, app: dash.Dash):
         """Set up the interactive callbacks."""
         
+        # The page starts with the whole graph and its base stylesheet, so the
+        # selection chain only runs once the user changes the selection
+        app.clientside_callback(
+            ClientsideFunction(namespace='graph', function_name='debounce'),
+            Output('selection-debounced', 'data'),
+            [Input('folder-file-selector', 'value')],
+            prevent_initial_call=True
+        )
+        
+        # Selections are often revisited, and every patch recomputes the previous
+        # selection, so node sets are memoized per (order-independent) selection
+        cache = Cache(app.server, config={'CACHE_TYPE': 'SimpleCache'})
+        
+        @cache.memoize(timeout=VISIBLE_NODES_CACHE_TIMEOUT)
+        def visible_nodes(selection: Tuple[str, ...]) -> Optional[Tuple[Set[str], Optional[str]]]:
+            return self._compute_visible_nodes(list(selection))
+            
         @app.callback(
-            Output('graph', 'elements'),
-            [Input('folder-file-selector', 'value')]
+            [Output('visible-nodes', 'data'), Output('applied-selection', 'data')],
+            [Input('selection-debounced', 'data')],
+            [State('applied-selection', 'data')],
+            prevent_initial_call=True
         )
-        def update_graph(selected_items):
+        def update_visible_nodes(selected_items, applied_items):
+            """Send the nodes to display as a patch against the previous selection.
+            
+            Visible ids are stored as object keys so the patch can add and delete
+            them individually; None shows the whole graph. Only the small previous
+            selection is sent back from the browser, and its node set recomputed.
+            """
             try:
-                # Get all nodes and edges
-                all_nodes, all_edges = self._create_nodes_and_edges()
-                
-                # If no selections, show everything
-                if not selected_items:
-                    return all_nodes + all_edges
-                
-                # Separate selected folders and files
-                selected_folders = [item for item in selected_items if item.startswith('folder:')]
-                selected_files = [item for item in selected_items if item.startswith('file:')]
-                
-                # Keep track of nodes to display
-                keep_nodes = set()
-                
-                # Always include the selected folders and files
-                keep_nodes.update(selected_folders)
-                keep_nodes.update(selected_files)
+                visible = visible_nodes(tuple(sorted(selected_items or ())))
+                previous = visible_nodes(tuple(sorted(applied_items))) if applied_items else None
+                if visible is None:
+                    # The whole graph may already be displayed
+                    return (dash.no_update if previous is None else None), selected_items
+                keep_nodes, single_file = visible
                 
-                # For each selected folder, add all its contained files
-                for edge in all_edges:
-                    if edge['data']['type'] == 'contains' and edge['data']['source'] in selected_folders:
-                        keep_nodes.add(edge['data']['target'])
-                
-                # For each selected file, add all its contained classes and functions
-                file_content_nodes = set()
-                processed_files = set(selected_files)
-                
-                # Recursively process the hierarchy
-                while processed_files:
-                    current_file = processed_files.pop()
-                    
-                    # Find all nodes contained in this file
-                    for edge in all_edges:
-                        if edge['data']['source'] == current_file and edge['data']['type'] == 'contains':
-                            target = edge['data']['target']
-                            file_content_nodes.add(target)
-                            
-                            # If target is a class, also add its methods
-                            for class_edge in all_edges:
-                                if class_edge['data']['source'] == target and class_edge['data']['type'] == 'contains':
-                                    file_content_nodes.add(class_edge['data']['target'])
-                
-                # Add all content nodes to our keep set
-                keep_nodes.update(file_content_nodes)
-                
-                # Special case: if only one file is selected, show its cross-file connections
-                if len(selected_files) == 1 and not selected_folders:
-                    # Get all nodes from the selected file
-                    file_nodes = set()
-                    for node in file_content_nodes:
-                        file_nodes.add(node)
+                if previous is not None:
+                    previous_nodes, previous_file = previous
+                    added = keep_nodes - previous_nodes
+                    removed = previous_nodes - keep_nodes
+                    if not (added or removed) and single_file == previous_file:
+                        # Same display for a different selection, so the stylesheet
+                        # and level-of-detail callbacks need not run again
+                        return dash.no_update, selected_items
+                    if len(added) + len(removed) < len(keep_nodes):
+                        patch = Patch()
+                        patch['file'] = single_file
+                        for node_id in added:
+                            patch['nodes'][node_id] = 1
+                        for node_id in removed:
+                            del patch['nodes'][node_id]
+                        return patch, selected_items
                         
-                    # Add nodes from other files that are connected to our file's nodes
-                    connected_nodes = set()
-                    for edge in all_edges:
-                        # For 'calls' or 'uses' relationships
-                        if edge['data']['type'] in ['calls', 'uses']:
-                            source = edge['data']['source']
-                            target = edge['data']['target']
-                            
-                            # If source is in our file and target is in another file
-                            if source in file_nodes and target not in file_nodes:
-                                connected_nodes.add(target)
-                                
-                            # If target is in our file and source is in another file
-                            elif target in file_nodes and source not in file_nodes:
-                                connected_nodes.add(source)
-                    
-                    # For nodes from other files, add their parent nodes to show context
-                    context_nodes = set()
-                    for node_id in connected_nodes:
-                        # Find parent nodes (files or classes)
-                        for edge in all_edges:
-                            if edge['data']['type'] == 'contains' and edge['data']['target'] == node_id:
-                                parent_id = edge['data']['source']
-                                context_nodes.add(parent_id)
-                                
-                                # If parent is a class, also add its file
-                                if not parent_id.startswith('file:'):
-                                    for edge2 in all_edges:
-                                        if edge2['data']['type'] == 'contains' and edge2['data']['target'] == parent_id:
-                                            context_nodes.add(edge2['data']['source'])
-                    
-                    # Add all connected and context nodes to our keep set
-                    keep_nodes.update(connected_nodes)
-                    keep_nodes.update(context_nodes)
-                
-                # Filter nodes and edges
-                filtered_nodes = [n for n in all_nodes if n['data']['id'] in keep_nodes]
-                
-                # For edges, only keep those where both source and target are in our filtered nodes
-                filtered_edges = []
-                for edge in all_edges:
-                    source = edge['data']['source']
-                    target = edge['data']['target']
-                    
-                    if source in keep_nodes and target in keep_nodes:
-                        # If this is a cross-file connection in single-file mode, highlight it
-                        if len(selected_files) == 1 and not selected_folders:
-                            if edge['data']['type'] in ['calls', 'uses']:
-                                source_file = source.split(':')[0] if ':' in source else ''
-                                target_file = target.split(':')[0] if ':' in target else ''
-                                
-                                # If source and target are in different files
-                                if source_file != target_file:
-                                    # Clone the edge and add highlighting
-                                    highlighted_edge = edge.copy()
-                                    highlighted_edge['classes'] = edge.get('classes', '') + ' cross-file-highlight'
-                                    filtered_edges.append(highlighted_edge)
-                                    continue
-                        
-                        # Add regular edge
-                        filtered_edges.append(edge)
-                
-                return filtered_nodes + filtered_edges
+                # Edges are hidden with their endpoints, so only node ids travel over the wire
+                return {'nodes': dict.fromkeys(keep_nodes, 1), 'file': single_file}, selected_items
                 
             except Exception as e:
-                print(f"Error in update_graph: {str(e)}")
-                return dash.no_update
+                print(f"Error in update_visible_nodes: {str(e)}")
+                return dash.no_update, dash.no_update
+                
+        app.clientside_callback(
+            ClientsideFunction(namespace='graph', function_name='load'),
+            [Output('graph', 'elements'), Output('subgraph-cache', 'data')],
+            [Input('graph-url', 'data')]
+        )
+        
+        # Add the contents of tapped and selected files in level-of-detail mode
+        app.clientside_callback(
+            ClientsideFunction(namespace='graph', function_name='expand'),
+            Output('graph', 'elements', allow_duplicate=True),
+            [Input('graph', 'tapNodeData'), Input('visible-nodes', 'data')],
+            [State('graph', 'elements'), State('subgraph-cache', 'data')],
+            prevent_initial_call=True
+        )
+        
+        # Visibility is applied clientside as stylesheet rules
+        app.clientside_callback(
+            ClientsideFunction(namespace='graph', function_name='stylesheet'),
+            Output('graph', 'stylesheet'),
+            [Input('visible-nodes', 'data')],
+            [State('stylesheet-parts', 'data')],
+            prevent_initial_call=True
+        )
         
         @app.callback(
             Output('node-details', 'children'),
@@ -549,66 +924,22 @@ class GraphVisualizer:
                 return "Click a node to see details"
             
             try:
-                if node_data['type'] == 'function' or node_data['type'] == 'method':
-                    metadata = node_data['metadata']
-                    return html.Div([
-                        html.H5(node_data['label']),
-                        html.P(f"Type: {node_data['type'].capitalize()}"),
-                        html.P(f"File: {metadata['file_path']}"),
-                        html.P(f"Line: {metadata['line_number']}"),
-                        html.H6("Docstring:"),
-                        html.P(metadata['docstring'] or "No docstring"),
-                        html.H6("Parameters:"),
-                        html.Ul([
-                            html.Li(f"{param['name']}: {param['type']}")
-                            for param in metadata['parameters']
-                        ]),
-                        html.H6("Returns:"),
-                        html.P(metadata['returns'])
-                    ])
-                elif node_data['type'] == 'class':
-                    metadata = node_data['metadata']
-                    return html.Div([
-                        html.H5(node_data['label']),
-                        html.P(f"Type: Class"),
-                        html.P(f"File: {metadata['file_path']}"),
-                        html.H6("Docstring:"),
-                        html.P(metadata['docstring'] or "No docstring")
-                    ])
-                else:
-                    return html.Div([
-                        html.H5(node_data['label']),
-                        html.P(f"Type: {node_data['type'].capitalize()}")
-                    ])
+                render = _NODE_DETAIL_RENDERERS.get(node_data['type'], _render_node_details)
+                return render(node_data, self._meta_by_id.get(node_data['id']))
             except Exception as e:
                 print(f"Error in display_node_data: {str(e)}")
                 return "Error displaying node details"
-        
-        # Add callback for dynamic layout updates
+                
+        # The force-directed layout only runs when asked for, never on hover
         @app.callback(
             Output('graph', 'layout'),
-            [Input('graph', 'mouseoverNodeData')]
+            Input('relayout-button', 'n_clicks'),
+            prevent_initial_call=True
         )
-        def update_layout(node_data):
-            """Update layout parameters when hovering over nodes."""
-            if node_data:
-                return {
-                    'name': 'cola',
-                    'nodeSpacing': 100,
-                    'edgeLength': 200,
-                    'padding': 50,
-                    'animate': True,
-                    'maxSimulationTime': 3000,
-                    'fit': False,  # Don't reset view when updating
-                    'infinite': True,
-                    'springLength': 200,
-                    'springCoeff': 0.0008,
-                    'gravity': 1,
-                    'dragCoeff': 0.02,
-                    'avoidOverlap': True,
-                    'refresh': 1
-                }
-            return dash.no_update
+        def relayout(n_clicks):
+            # Cytoscape only runs a layout that differs from the current one,
+            # so every click gets a distinct (otherwise ignored) key
+            return {**RELAYOUT, 'run': n_clicks}
         
     def run_server(self, port: int = 8050, debug: bool = True):
         """Run the visualization server."""